@@ -1,14 +1,17 @@
-import io, os, json, zipfile
+import os, json
 import streamlit as st
-import pandas as pd
-from datetime import datetime, timedelta
-from io import BytesIO
-import importlib
-import edi_x12
-importlib.reload(edi_x12)
+from datetime import datetime
 from edi_x12 import (
     Provider, Party, build_270, parse_271,
-    ServiceTypeMap, PAYER_PROFILES, normalize_eb_for_reporting
+    SERVICE_TYPE_CODES, SERVICE_TYPE_LABELS, PAYER_PROFILES, normalize_eb_for_reporting
+)
+from edi_helpers import (
+    build_276, build_837, build_835, build_837_batch, read_claims_csv, BATCH_837_COLUMNS, content_digest,
+    CP1252_PUNCT, reject_non_x12, sniff_encoding, iter_raw_chunks, skip_bom, normalize_punctuation,
+    elements_table,
+)
+from edi_cache import (
+    parse_277_cached, parse_835_cached, session_upload, xlsx_cached, csv_cached
 )
 
 # ======================================================
@@ -25,223 +28,219 @@ st.title("📡 X12 EDI Transaction Suite")
 # ======================================================
 PROFILES_FILE = "profiles.json"
 
-def load_profiles() -> dict:
-    base = {k: v.copy() for k, v in PAYER_PROFILES.items()}
+try:
+    import orjson  # optional: same bytes out, several times faster than stdlib json
+
+    def _jloads(data: bytes):
+        return orjson.loads(data)
+
+    def _jdumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+except ImportError:
+    def _jloads(data: bytes):
+        return json.loads(data)
+
+    def _jdumps(obj) -> bytes:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+
+def profiles_mtime() -> float:
+    return os.path.getmtime(PROFILES_FILE) if os.path.exists(PROFILES_FILE) else 0.0
+
+@st.cache_data(show_spinner=False)
+def _load_profiles_cached(mtime: float) -> dict:
+    # mtime is only the cache key: editing profiles.json invalidates the entry.
+    # Shallow merge: user entries replace whole profiles, but built-in entries are
+    # the PAYER_PROFILES dicts themselves (cache_data returns this very object on a
+    # miss, copies only on hits). Treat profiles as read-only: build_270 only reads them.
+    user = {}
     if os.path.exists(PROFILES_FILE):
         try:
-            with open(PROFILES_FILE, "r", encoding="utf-8") as f:
-                user = json.load(f)
-            for k, v in user.items():
-                base[k] = v
+            with open(PROFILES_FILE, "rb") as f:
+                user = _jloads(f.read())
         except Exception:
             pass
-    return base
+    try:
+        return {**PAYER_PROFILES, **user}
+    except TypeError:  # profiles.json holds something other than an object
+        return dict(PAYER_PROFILES)
+
+def load_profiles() -> dict:
+    """Built-in profiles merged with profiles.json, shared across sessions until the file changes."""
+    return _load_profiles_cached(profiles_mtime())
 
 if "profiles" not in st.session_state:
     st.session_state.profiles = load_profiles()
+    # Selectbox options derived once per session instead of on every rerun.
+    st.session_state.profile_keys = list(st.session_state.profiles)
+    st.session_state.profile_default_idx = (
+        st.session_state.profile_keys.index("default") if "default" in st.session_state.profiles else 0
+    )
+
+@st.cache_data(show_spinner=False)
+def profiles_export_bytes(profiles: dict) -> bytes:
+    # Re-serialized only when the profiles content changes, not on every rerun.
+    return _jdumps(profiles)
 
 # ======================================================
 # Helper Functions
 # ======================================================
-def robust_decode(raw: bytes) -> str:
-    if raw.startswith(b"%PDF"):
-        raise ValueError("Not a plain-text X12 file (PDF detected).")
-    if raw[:2] == b"\x1f\x8b":
-        raise ValueError("GZIP detected. Upload uncompressed X12 or a ZIP containing it.")
-    for enc in ("cp1252", "utf-8", "utf-8-sig", "latin-1"):
-        try:
-            return raw.decode(enc)
-        except UnicodeDecodeError:
-            continue
-    return raw.decode("utf-8", errors="replace")
+_PREVIEW_BYTES = 2000
 
-# ======================================================
-# 276 / 277
-# ======================================================
-def build_276(isa_ctrl, gs_ctrl, st_ctrl, payer_id, provider_name, provider_npi,
-              subscriber_last, subscriber_first, subscriber_id,
-              claim_control_number="", date_of_service=None):
-    now = datetime.now()
-    dos = date_of_service or now.strftime("%Y%m%d")
-    edi = (
-        f"ISA*00*          *00*          *ZZ*SENDERID       *ZZ*RECEIVERID     *{now:%y%m%d}*{now:%H%M}*^*00501*{isa_ctrl:09d}*0*T*:~\n"
-        f"GS*HN*SENDER*RECEIVER*{now:%Y%m%d}*{now:%H%M}*{gs_ctrl}*X*005010X212~\n"
-        f"ST*276*{st_ctrl}*005010X212~\n"
-        f"BHT*0010*13*{claim_control_number or st_ctrl}*{now:%Y%m%d}*{now:%H%M}~\n"
-        f"HL*1**20*1~\n"
-        f"NM1*PR*2*PAYER NAME****PI*{payer_id}~\n"
-        f"HL*2*1*21*1~\n"
-        f"NM1*41*2*{provider_name}*****XX*{provider_npi}~\n"
-        f"HL*3*2*19*0~\n"
-        f"NM1*IL*1*{subscriber_last}*{subscriber_first}****MI*{subscriber_id}~\n"
-        f"DTP*472*D8*{dos}~\n"
-        f"SE*12*{st_ctrl}~\n"
-        f"GE*1*{gs_ctrl}~\n"
-        f"IEA*1*{isa_ctrl:09d}~"
+def profile_defaults(profile: dict) -> tuple:
+    """Widget defaults derived from a payer profile, resolved once per rerun."""
+    eq = [c for c in profile.get("preferred_eq", ["30"]) if c in SERVICE_TYPE_LABELS] or ["30"]
+    return eq, profile.get("require_dmg", False)
+
+@st.cache_resource
+def _eq_search_index() -> dict:
+    return {k: v.lower() for k, v in SERVICE_TYPE_LABELS.items()}
+
+_EQ_SEARCH = _eq_search_index()
+_EQ_OPTION_LIMIT = 50
+
+def eq_options(query: str, selected: list) -> list:
+    """EQ codes matching query (code or description), capped so the widget stays small."""
+    q = query.strip().lower()
+    if not q:
+        return list(SERVICE_TYPE_CODES)
+    hits = [k for k, label in _EQ_SEARCH.items() if q in label and k not in selected]
+    return list(selected) + hits[:_EQ_OPTION_LIMIT]
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _decode_and_parse_271(content_hash: str, _raw: bytes) -> dict:
+    head = next(iter_raw_chunks(_raw), b"")
+    reject_non_x12(head)
+    enc = "ascii" if _raw.isascii() else sniff_encoding(head)
+    raw_chunks = iter_raw_chunks(_raw)
+    if enc == "utf-8-sig":
+        enc, raw_chunks = "utf-8", skip_bom(raw_chunks)
+    elif enc == "cp1252":
+        raw_chunks = (c.translate(CP1252_PUNCT) for c in raw_chunks)
+    # parse_271 splits the bytes itself and decodes only the segments it reports.
+    parsed = parse_271(raw_chunks, decode=lambda b: normalize_punctuation(b.decode(enc, errors="replace")))
+    # Build the display tables once per upload; st.dataframe takes Arrow as-is.
+    import pyarrow as pa  # only needed once a 271 is parsed
+    parsed["_eb_df"] = pa.Table.from_pylist(parsed["eb"])
+    parsed["_aaa_df"] = pa.Table.from_pylist(parsed["aaa"])
+    # DTP/REF are kept as raw element lists; name the elements for display.
+    parsed["_dtp_df"] = elements_table(parsed["dtp"], ("qualifier", "format", "date"))
+    parsed["_ref_df"] = elements_table(parsed["ref"], ("qualifier", "value", "description"))
+    parsed["_summary"] = normalize_eb_for_reporting(parsed["eb"])
+    # Preview comes from the first raw chunk; the full text is never kept.
+    parsed["_preview"] = head[:_PREVIEW_BYTES].decode(enc, errors="replace")
+    return parsed
+
+# Short TTL so the ISA/GS/BHT timestamps of a reused 270 stay current.
+@st.cache_data(show_spinner=False, ttl=60)
+def _build_270_cached(payer_id, prov_name, npi, sub_last, sub_first, sub_id,
+                      service_types: tuple, date_start, profile: dict, dob, gender,
+                      ref_values: tuple = ()) -> tuple:
+    provider = Provider(name=prov_name, npi=npi)
+    subscriber = Party(last=sub_last, first=sub_first, id_code=sub_id)
+    edi = build_270(
+        1, 1, 1000, payer_id, provider, subscriber, None,
+        list(service_types), date_start,
+        profile=profile, dmg_dob=dob, dmg_gender=gender, ref_values=dict(ref_values)
     )
-    return edi
-
-def parse_277(edi_text: str):
-    seg_t = "~"
-    if edi_text.count("~") < 2 and edi_text.count("\n") >= 2:
-        seg_t = "\n"
-    lines = [l.strip() for l in edi_text.replace("\r\n", "\n").split(seg_t) if l.strip()]
-    rows, current = [], {}
-    for line in lines:
-        parts = line.split("*")
-        tag = parts[0].upper()
-        if tag == "TRN":
-            current.setdefault("TraceNumber", parts[2] if len(parts) > 2 else "")
-        elif tag == "CLP":
-            if current:
-                rows.append(current)
-            current = {
-                "ClaimID": parts[1] if len(parts) > 1 else "",
-                "ClaimStatus": parts[2] if len(parts) > 2 else "",
-                "TotalCharge": parts[3] if len(parts) > 3 else "",
-                "TotalPaid": parts[4] if len(parts) > 4 else ""
-            }
-        elif tag == "STC":
-            current["StatusComposite"] = parts[1] if len(parts) > 1 else ""
-            current["StatusDate"] = parts[2] if len(parts) > 2 else ""
-        elif tag == "NM1" and len(parts) > 1 and parts[1] == "QC":
-            current["PatientLast"] = parts[3] if len(parts) > 3 else ""
-            current["PatientFirst"] = parts[4] if len(parts) > 4 else ""
-        elif tag == "DTP":
-            current.setdefault("Dates", []).append(parts[1:])
-    if current:
-        rows.append(current)
-    return pd.DataFrame(rows)
+    return edi, edi.encode()
 
-# ======================================================
-# 837 / 835
-# ======================================================
-def build_837(payer_id, provider_npi, patient_name, patient_id, claim_id, amount):
-    now = datetime.now()
-    return f"""ISA*00**00**ZZ*SENDER*ZZ*RECEIVER*{now:%y%m%d}*{now:%H%M}*^*00501*000000001*0*T*:~
-GS*HC*SENDER*RECEIVER*{now:%Y%m%d}*{now:%H%M}*1*X*005010X222A1~
-ST*837*0001*005010X222A1~
-BHT*0019*00*{claim_id}*{now:%Y%m%d}*{now:%H%M}*CH~
-NM1*85*2*BUDDHA CLINIC*****XX*{provider_npi}~
-HL*1**20*1~
-NM1*IL*1*{patient_name}****MI*{patient_id}~
-CLM*{claim_id}*{amount}***11:B:1*Y*A*Y*I~
-SE*12*0001~
-GE*1*1~
-IEA*1*000000001~"""
-
-def build_835(payer_name, payer_id, provider_npi, claim_id, patient_name, paid_amount):
-    now = datetime.now()
-    return f"""ISA*00**00**ZZ*{payer_id:<15}*ZZ*RECEIVER*{now:%y%m%d}*{now:%H%M}*^*00501*000000001*0*T*:~
-GS*HP*{payer_id}*RECEIVER*{now:%Y%m%d}*{now:%H%M}*1*X*005010X221A1~
-ST*835*0001*005010X221A1~
-BPR*I*{paid_amount}*C*CHK*01*999999999*DA*123456789*{now:%Y%m%d}~
-N1*PR*{payer_name}*PI*{payer_id}~
-N1*PE*BUDDHA CLINIC*XX*{provider_npi}~
-CLP*{claim_id}*1*150*{paid_amount}**MC*{patient_name}*12*1~
-SE*12*0001~
-GE*1*1~
-IEA*1*000000001~"""
-
-def parse_835_to_df(edi_text: str):
-    seg_t = "~"
-    if edi_text.count("~") < 2 and edi_text.count("\n") >= 2:
-        seg_t = "\n"
-    lines = [l.strip() for l in edi_text.replace("\r\n", "\n").split(seg_t) if l.strip()]
-    payer, payee, claims, check = {}, {}, [], {}
-    current = None
-    for line in lines:
-        parts = line.split("*")
-        tag = parts[0].upper()
-        if tag == "BPR":
-            check["PaymentAmount"] = parts[2] if len(parts) > 2 else ""
-        elif tag == "TRN":
-            check["CheckNumber"] = parts[2] if len(parts) > 2 else ""
-        elif tag == "N1":
-            if len(parts) > 1 and parts[1] == "PR":
-                payer["PayerName"] = parts[2]
-                payer["PayerID"] = parts[-1]
-            elif len(parts) > 1 and parts[1] == "PE":
-                payee["PayeeName"] = parts[2]
-                payee["PayeeNPI"] = parts[-1]
-        elif tag == "CLP":
-            if current:
-                claims.append(current)
-            current = {
-                "ClaimID": parts[1],
-                "ClaimStatus": parts[2],
-                "TotalCharge": parts[3],
-                "TotalPaid": parts[4],
-                "PatientName": ""
-            }
-        elif tag == "NM1" and len(parts) > 1 and parts[1] == "QC":
-            if current:
-                current["PatientName"] = parts[3]
-    if current:
-        claims.append(current)
-    df = pd.DataFrame(claims)
-    df["PayerName"] = payer.get("PayerName", "")
-    df["PayeeName"] = payee.get("PayeeName", "")
-    df["CheckNumber"] = check.get("CheckNumber", "")
-    df["PaymentAmount"] = check.get("PaymentAmount", "")
-    return df
+@st.cache_data(show_spinner=False, max_entries=8)
+def _build_837_batch_cached(content_hash: str, _raw: bytes):
+    docs = build_837_batch(read_claims_csv(_raw))
+    return len(docs), "\n".join(docs).encode()
+
+def table_downloads(digest: str, df, name: str, sheet_name: str, key: str) -> None:
+    """CSV right away; the slower .xlsx only after an explicit Build click."""
+    st.download_button("⬇️ Download CSV", data=csv_cached(digest, df), file_name=f"{name}.csv",
+                       mime="text/csv", key=f"{key}_csv_dl")
+    _excel_download(digest, df, name, sheet_name, key)
+
+@st.fragment
+def _excel_download(digest: str, df, name: str, sheet_name: str, key: str) -> None:
+    # A fragment, so the Build click reruns only this widget pair.
+    if st.button("Build Excel", key=f"{key}_xlsx_btn"):
+        st.session_state[f"{key}_xlsx_for"] = digest
+    if st.session_state.get(f"{key}_xlsx_for") == digest:
+        st.download_button("⬇️ Download Excel", data=xlsx_cached(digest, sheet_name, df),
+                           file_name=f"{name}.xlsx",
+                           mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                           key=f"{key}_xlsx_dl")
 
 # ======================================================
 # Streamlit Tabs
+# Interactive tabs are fragments: their widgets rerun only that tab.
 # ======================================================
 tabs = st.tabs(["270/271", "276/277", "837/835", "Profiles", "Help"])
 
 # ---------------- 270/271 ----------------
-with tabs[0]:
+@st.fragment
+def eligibility_tab():
     st.header("🩺 270/271 – Eligibility Inquiry & Response")
     sub_tabs = st.tabs(["Build 270", "Parse 271"])
 
     # ===== Build 270 =====
     with sub_tabs[0]:
         profiles = st.session_state.profiles
-        pkeys = list(profiles.keys())
-        profile_key = st.selectbox("Payer Profile", options=pkeys, key="t270_profile")
+        profile_key = st.selectbox("Payer Profile", options=st.session_state.profile_keys,
+                                   index=st.session_state.profile_default_idx, key="t270_profile")
         profile = profiles[profile_key]
+        preferred_eq, require_dmg = profile_defaults(profile)
+
+        eq_query = st.text_input("Search Service Types", key="t270_eq_query",
+                                 placeholder="Code or description, e.g. 30 or vision")
+        # While searching, keep the current picks and show at most _EQ_OPTION_LIMIT matches.
+        eq_selected = st.session_state.get("t270_services", preferred_eq) if eq_query else preferred_eq
+
+        # Profile and search reshape the form, so they stay outside it; everything
+        # else is batched into one rerun on Generate instead of one per keystroke.
+        with st.form("t270_form"):
+            payer_id = st.text_input("Payer ID", "12345", key="t270_payer")
+            prov_name = st.text_input("Provider Name", "Buddha Clinic", key="t270_prov")
+            npi = st.text_input("Provider NPI", "1234567890", key="t270_npi")
+            sub_last = st.text_input("Subscriber Last", "DOE", key="t270_last")
+            sub_first = st.text_input("Subscriber First", "JOHN", key="t270_first")
+            sub_id = st.text_input("Subscriber Member ID", "W123456789", key="t270_subid")
+            dob = st.text_input("Subscriber DOB (YYYYMMDD)", "19800101", key="t270_dob",
+                                help="Required by this payer profile." if require_dmg else None)
+            gender = st.selectbox("Gender", ["", "M", "F", "U"], key="t270_gender")
+            service_types = st.multiselect(
+                "Service Types (EQ)", eq_options(eq_query, eq_selected),
+                default=eq_selected, format_func=SERVICE_TYPE_LABELS.__getitem__,
+                key="t270_services"
+            )
+            ref_values = tuple(
+                (ref, st.text_input(f"REF {ref} value", key=f"t270_ref_{ref}"))
+                for ref in profile.get("extra_ref", [])
+            )
+            generate = st.form_submit_button("Generate 270")
 
-        payer_id = st.text_input("Payer ID", "12345", key="t270_payer")
-        prov_name = st.text_input("Provider Name", "Buddha Clinic", key="t270_prov")
-        npi = st.text_input("Provider NPI", "1234567890", key="t270_npi")
-        sub_last = st.text_input("Subscriber Last", "DOE", key="t270_last")
-        sub_first = st.text_input("Subscriber First", "JOHN", key="t270_first")
-        sub_id = st.text_input("Subscriber Member ID", "W123456789", key="t270_subid")
-        dob = st.text_input("Subscriber DOB (YYYYMMDD)", "19800101", key="t270_dob")
-        gender = st.selectbox("Gender", ["", "M", "F", "U"], key="t270_gender")
-        service_types = st.multiselect(
-            "Service Types (EQ)", list(ServiceTypeMap.keys()),
-            default=["30"], format_func=lambda x: f"{x} – {ServiceTypeMap.get(x)}",
-            key="t270_services"
-        )
-
-        if st.button("Generate 270", key="t270_btn"):
-            provider = Provider(name=prov_name, npi=npi)
-            subscriber = Party(last=sub_last, first=sub_first, id_code=sub_id)
-            edi270 = build_270(
-                1, 1, 1000, payer_id, provider, subscriber, None,
-                service_types, datetime.today().strftime("%Y%m%d"),
-                dmg_dob=dob, dmg_gender=gender
+        if generate:
+            st.session_state.edi270_out = _build_270_cached(
+                payer_id, prov_name, npi, sub_last, sub_first, sub_id,
+                tuple(service_types), datetime.today().strftime("%Y%m%d"), profile, dob, gender, ref_values
             )
+        # Text and encoded bytes are kept from the last Generate click, so reruns
+        # (including the download click itself) neither rebuild nor re-encode them.
+        if "edi270_out" in st.session_state:
+            edi270, edi270_bytes = st.session_state.edi270_out
             st.code(edi270)
-            st.download_button("⬇️ Download 270", data=edi270.encode(), file_name="270_request.x12", key="t270_dl")
+            st.download_button("⬇️ Download 270", data=edi270_bytes, file_name="270_request.x12", key="t270_dl")
 
     # ===== Parse 271 =====
     with sub_tabs[1]:
-        file = st.file_uploader("Upload 271 File", type=["x12", "edi", "txt"], key="t271_upload")
+        file = st.file_uploader("Upload 271 File", type=["x12", "edi", "txt", "zip"], key="t271_upload")
+        parsed = None
         if file:
-            text = file.read().decode("utf-8", errors="ignore")
-            parsed = parse_271(text)
+            try:
+                _, parsed = session_upload("t271_parsed", file, _decode_and_parse_271)
+            except ValueError as e:
+                st.error(str(e))
 
-            # 🛡️ Safe fallbacks for both old/new parser versions
-            eb_df = parsed.get("_eb_df") or pd.DataFrame(parsed.get("eb", []))
-            aaa_df = parsed.get("_aaa_df") or pd.DataFrame(parsed.get("aaa", []))
-            summary = parsed.get("_summary") or normalize_eb_for_reporting(parsed.get("eb", []))
+        if parsed:
+            eb_df, aaa_df, summary = parsed["_eb_df"], parsed["_aaa_df"], parsed["_summary"]
 
             st.subheader("Eligibility Benefits (EB)")
-            if not eb_df.empty:
+            if eb_df.num_rows:
                 st.dataframe(eb_df, use_container_width=True)
             else:
                 st.info("No EB segments found.")
@@ -250,13 +249,28 @@ with tabs[0]:
             st.json(summary)
 
             st.subheader("AAA (Rejections / Errors)")
-            if not aaa_df.empty:
+            if aaa_df.num_rows:
                 st.dataframe(aaa_df, use_container_width=True)
             else:
                 st.info("No AAA segments found.")
 
+            with st.expander("Dates (DTP) / References (REF)"):
+                for label, table in (("DTP", parsed["_dtp_df"]), ("REF", parsed["_ref_df"])):
+                    if table.num_rows:
+                        st.dataframe(table, use_container_width=True)
+                    else:
+                        st.info(f"No {label} segments found.")
+
+            with st.expander("Raw preview / parser debug"):
+                st.code(parsed["_preview"])
+                st.json({"debug": parsed["_debug"], "validation": parsed["_validation"]})
+
+with tabs[0]:
+    eligibility_tab()
+
 # ---------------- 276/277 ----------------
-with tabs[1]:
+@st.fragment
+def claim_status_tab():
     st.header("📨 276/277 – Claim Status Inquiry & Response")
     payer = st.text_input("Payer ID", "12345", key="t276_payer")
     prov = st.text_input("Provider Name", "Buddha Clinic", key="t276_prov")
@@ -267,17 +281,28 @@ with tabs[1]:
 
     if st.button("Generate 276", key="t276_btn"):
         edi276 = build_276(1, 1, 1000, payer, prov, npi, sub_last, sub_first, sub_id)
+        st.session_state.edi276_out = (edi276, edi276.encode())
+    if "edi276_out" in st.session_state:
+        edi276, edi276_bytes = st.session_state.edi276_out
         st.code(edi276)
-        st.download_button("⬇️ Download 276", edi276.encode(), "276_request.x12", key="t276_dl")
+        st.download_button("⬇️ Download 276", edi276_bytes, "276_request.x12", key="t276_dl")
 
-    file = st.file_uploader("Upload 277 File", type=["x12", "edi", "txt"], key="t277_upload")
+    file = st.file_uploader("Upload 277 File", type=["x12", "edi", "txt", "zip"], key="t277_upload")
     if file:
-        text = file.read().decode("utf-8", errors="ignore")
-        df = parse_277(text)
-        st.dataframe(df, use_container_width=True)
+        try:
+            digest, df = session_upload("t277_parsed", file, parse_277_cached)
+        except ValueError as e:  # e.g. a corrupt ZIP
+            st.error(str(e))
+        else:
+            st.dataframe(df, use_container_width=True)
+            table_downloads(digest, df, "277_parsed", "277_Parsed", "t277")
+
+with tabs[1]:
+    claim_status_tab()
 
 # ---------------- 837/835 ----------------
-with tabs[2]:
+@st.fragment
+def claims_payments_tab():
     st.header("💰 837/835 – Claims & Payments")
     payer = st.text_input("Payer ID", "12345", key="t837_payer")
     npi = st.text_input("Provider NPI", "1234567890", key="t837_npi")
@@ -288,8 +313,25 @@ with tabs[2]:
 
     if st.button("Generate 837", key="t837_btn"):
         edi837 = build_837(payer, npi, patient, pid, claim, amt)
+        st.session_state.edi837_out = (edi837, edi837.encode())
+    if "edi837_out" in st.session_state:
+        edi837, edi837_bytes = st.session_state.edi837_out
         st.code(edi837)
-        st.download_button("⬇️ Download 837", edi837.encode(), "837_claim.x12", key="t837_dl")
+        st.download_button("⬇️ Download 837", edi837_bytes, "837_claim.x12", key="t837_dl")
+
+    with st.expander("Batch 837 from CSV"):
+        st.caption("Columns: " + ", ".join(BATCH_837_COLUMNS) + " — one claim per row.")
+        batch = st.file_uploader("Upload claims CSV", type=["csv"], key="t837_batch_upload")
+        if batch and st.button("Generate 837 Batch", key="t837_batch_btn"):
+            raw = batch.getvalue()
+            try:
+                st.session_state.edi837_batch_out = _build_837_batch_cached(content_digest(raw), raw)
+            except ValueError as e:
+                st.error(str(e))
+        if "edi837_batch_out" in st.session_state:
+            n_docs, batch_bytes = st.session_state.edi837_batch_out
+            st.success(f"Built {n_docs} claim(s).")
+            st.download_button("⬇️ Download 837 Batch", batch_bytes, "837_batch.x12", key="t837_batch_dl")
 
     st.subheader("Parse / Build 835")
     payer_name = st.text_input("Payer Name", "Insurance Co", key="t835_payer")
@@ -301,35 +343,43 @@ with tabs[2]:
 
     if st.button("Generate 835", key="t835_btn"):
         edi835 = build_835(payer_name, payer_id, prov_npi, claim, patient, amt)
+        st.session_state.edi835_out = (edi835, edi835.encode())
+    if "edi835_out" in st.session_state:
+        edi835, edi835_bytes = st.session_state.edi835_out
         st.code(edi835)
-        st.download_button("⬇️ Download 835", edi835.encode(), "835_remit.x12", key="t835_dl")
+        st.download_button("⬇️ Download 835", edi835_bytes, "835_remit.x12", key="t835_dl")
 
-    file = st.file_uploader("Upload 835 File", type=["x12", "edi", "txt"], key="t835_upload")
+    file = st.file_uploader("Upload 835 File", type=["x12", "edi", "txt", "zip"], key="t835_upload")
     if file:
-        text = file.read().decode("utf-8", errors="ignore")
-        df = parse_835_to_df(text)
-        st.dataframe(df, use_container_width=True)
-        out = BytesIO()
-        with pd.ExcelWriter(out, engine="xlsxwriter") as writer:
-            df.to_excel(writer, index=False, sheet_name="835_Parsed")
-        out.seek(0)
-        st.download_button("⬇️ Download Excel", data=out,
-                           file_name="835_parsed.xlsx",
-                           mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                           key="t835_excel_dl")
+        try:
+            digest, df = session_upload("t835_parsed", file, parse_835_cached)
+        except ValueError as e:  # e.g. a corrupt ZIP
+            st.error(str(e))
+        else:
+            st.dataframe(df, use_container_width=True)
+            table_downloads(digest, df, "835_parsed", "835_Parsed", "t835")
+
+with tabs[2]:
+    claims_payments_tab()
 
 # ---------------- Profiles ----------------
 with tabs[3]:
     st.subheader("⚙️ Manage Payer Profiles")
     st.json(st.session_state.profiles)
+    st.download_button("⬇️ Export All Profiles", data=profiles_export_bytes(st.session_state.profiles),
+                       file_name="profiles.json", mime="application/json", key="profiles_export")
 
 # ---------------- Help ----------------
-with tabs[4]:
-    st.markdown("""
+@st.cache_resource
+def _help_md() -> str:
+    return """
 ### 🧭 Help / Notes
 - **270/271**: Eligibility inquiry and response with summary view.
 - **276/277**: Claim status inquiry/response.
 - **837**: Claim submission generator.
 - **835**: Remittance advice builder & parser (Excel export).
 - **Profiles**: Customize payer-specific 270 configurations.
-""")
+"""
+
+with tabs[4]:
+    st.markdown(_help_md())
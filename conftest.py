@@ -0,0 +1 @@
+# Lets pytest import the top-level modules (edi_helpers, edi_x12, ...) from tests/.
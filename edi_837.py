@@ -3,6 +3,31 @@ from datetime import datetime
 DEFAULT_SEG = "~"
 DEFAULT_ELEM = "*"
 
+# Filled once per call with format_map; str += per segment is avoided.
+TEMPLATE_837 = (
+    "ISA*00*          *00*          *ZZ*{sender_id:<15}*ZZ*{receiver_id:<15}*{yymmdd}*{hhmm}*^*00501*{isa_ctrl:09d}*0*T*:~\n"
+    "GS*HC*{sender_id}*{receiver_id}*{ymd}*{hhmm}*{gs_ctrl}*X*005010X222A1~\n"
+    "ST*837*{st_ctrl}*005010X222A1~\n"
+    "BHT*0019*00*{claim_id}*{ymd}*{hhmm}*CH~\n"
+    "NM1*41*2*BILLING PROVIDER*****46*12345~\n"
+    "PER*IC*BILLING OFFICE*TE*8005551212~\n"
+    "NM1*40*2*PAYER NAME*****46*99999~\n"
+    "HL*1**20*1~\n"
+    "NM1*85*2*BUDDHA CLINIC*****XX*{billing_provider_npi}~\n"
+    "N3*123 MAIN STREET~\nN4*LUCKNOW*UP*226001~\n"
+    "REF*EI*123456789~\n"
+    "HL*2*1*22*0~\n"
+    "NM1*IL*1*{patient_name}****MI*{patient_id}~\n"
+    "{dos_segment}"
+    "CLM*{claim_id}*{claim_amount}***11:B:1*Y*A*Y*I~\n"
+    "HI*BK:12345~\n"
+    "LX*1~\n"
+    "SV1*HC:99213*100*UN*1***1~\n"
+    "SE*18*{st_ctrl}~\n"  # ST..SE inclusive, with the DTP*472 line
+    "GE*1*{gs_ctrl}~\n"
+    "IEA*1*{isa_ctrl:09d}~"
+)
+
 def build_837(
     isa_ctrl:int,
     gs_ctrl:int,
@@ -18,28 +43,12 @@ def build_837(
     dos_end:str=None
 ):
     now = datetime.now()
-    dos_segment = f"DTP*472*D8*{dos_start}~" if not dos_end else f"DTP*472*RD8*{dos_start}-{dos_end}~"
-
-    edi = ""
-    edi += f"ISA*00*          *00*          *ZZ*{sender_id:<15}*ZZ*{receiver_id:<15}*{now.strftime('%y%m%d')}*{now.strftime('%H%M')}*^*00501*{isa_ctrl:09d}*0*T*:~\n"
-    edi += f"GS*HC*{sender_id}*{receiver_id}*{now.strftime('%Y%m%d')}*{now.strftime('%H%M')}*{gs_ctrl}*X*005010X222A1~\n"
-    edi += f"ST*837*{st_ctrl}*005010X222A1~\n"
-    edi += f"BHT*0019*00*{claim_id}*{now.strftime('%Y%m%d')}*{now.strftime('%H%M')}*CH~\n"
-    edi += "NM1*41*2*BILLING PROVIDER*****46*12345~\n"
-    edi += f"PER*IC*BILLING OFFICE*TE*8005551212~\n"
-    edi += "NM1*40*2*PAYER NAME*****46*99999~\n"
-    edi += "HL*1**20*1~\n"
-    edi += "NM1*85*2*BUDDHA CLINIC*****XX*" + billing_provider_npi + "~\n"
-    edi += "N3*123 MAIN STREET~\nN4*LUCKNOW*UP*226001~\n"
-    edi += "REF*EI*123456789~\n"
-    edi += "HL*2*1*22*0~\n"
-    edi += f"NM1*IL*1*{patient_name}****MI*{patient_id}~\n"
-    edi += dos_segment
-    edi += f"CLM*{claim_id}*{claim_amount}***11:B:1*Y*A*Y*I~\n"
-    edi += "HI*BK:12345~\n"
-    edi += "LX*1~\n"
-    edi += "SV1*HC:99213*100*UN*1***1~\n"
-    edi += "SE*20*{st_ctrl}~\n"
-    edi += f"GE*1*{gs_ctrl}~\n"
-    edi += f"IEA*1*{isa_ctrl:09d}~"
-    return edi
+    dos_segment = f"DTP*472*D8*{dos_start}~\n" if not dos_end else f"DTP*472*RD8*{dos_start}-{dos_end}~\n"
+    return TEMPLATE_837.format_map({
+        "isa_ctrl": isa_ctrl, "gs_ctrl": gs_ctrl, "st_ctrl": st_ctrl,
+        "sender_id": sender_id, "receiver_id": receiver_id,
+        "billing_provider_npi": billing_provider_npi,
+        "patient_name": patient_name, "patient_id": patient_id,
+        "claim_id": claim_id, "claim_amount": claim_amount, "dos_segment": dos_segment,
+        "yymmdd": now.strftime("%y%m%d"), "ymd": now.strftime("%Y%m%d"), "hhmm": now.strftime("%H%M"),
+    })
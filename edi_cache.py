@@ -0,0 +1,42 @@
+# edi_cache.py
+# Streamlit-cached parse/export wrappers shared by app.py and claim_status_app.py
+import streamlit as st
+from edi_helpers import (
+    parse_277, parse_835_to_df, df_to_xlsx, content_digest, iter_raw_chunks, XLSX_REVISION
+)
+
+# Keyed on content_hash; the leading underscore keeps Streamlit from re-hashing the payload.
+@st.cache_data(show_spinner=False, max_entries=8)
+def parse_277_cached(content_hash: str, _raw: bytes):
+    return parse_277(iter_raw_chunks(_raw))
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def parse_835_cached(content_hash: str, _raw: bytes):
+    return parse_835_to_df(iter_raw_chunks(_raw))
+
+def session_upload(key: str, file, parse):
+    """(digest, parsed) for an upload, memoized in this session on the uploader's file_id.
+
+    Reruns from unrelated widgets then skip re-hashing the bytes and the
+    unpickled copy cache_data hands back on every hit. parse(digest, raw)
+    errors (ValueError for a corrupt ZIP) propagate and nothing is stored.
+    """
+    memo = st.session_state.get(key)
+    if memo is None or memo[0] != file.file_id:
+        raw = file.getvalue()
+        digest = content_digest(raw)
+        memo = (file.file_id, digest, parse(digest, raw))
+        st.session_state[key] = memo
+    return memo[1], memo[2]
+
+# The workbook is a pure function of the upload and the writer revision.
+@st.cache_data(show_spinner=False, max_entries=8)
+def _xlsx_for(content_hash: str, sheet_name: str, revision: int, _df) -> bytes:
+    return df_to_xlsx(_df, sheet_name)
+
+def xlsx_cached(content_hash: str, sheet_name: str, df) -> bytes:
+    return _xlsx_for(content_hash, sheet_name, XLSX_REVISION, df)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def csv_cached(content_hash: str, _df) -> bytes:
+    return _df.to_csv(index=False).encode("utf-8")
@@ -0,0 +1,370 @@
+# edi_helpers.py
+# Builders/parsers and upload decoding shared by app.py and claim_status_app.py
+import codecs, hashlib
+from datetime import datetime
+from io import BytesIO
+from itertools import chain
+import pandas as pd
+from edi_x12 import iter_segments
+
+# Skip xlsxwriter's per-string URL regex (claim IDs never need to be hyperlinks).
+# No constant_memory: to_excel writes column by column, and that mode drops
+# every cell written to a row it has already flushed.
+EXCEL_ENGINE_KWARGS = {"options": {"strings_to_urls": False}}
+
+# Part of every cached-workbook key: bump it whenever df_to_xlsx output changes,
+# so workbooks built by an older (revision 1 lost cells) writer are not served.
+XLSX_REVISION = 2
+
+def df_to_xlsx(df, sheet_name: str) -> bytes:
+    """DataFrame -> .xlsx bytes with header-sized columns."""
+    out = BytesIO()
+    with pd.ExcelWriter(out, engine="xlsxwriter", engine_kwargs=EXCEL_ENGINE_KWARGS) as writer:
+        df.to_excel(writer, index=False, sheet_name=sheet_name)
+        worksheet = writer.sheets[sheet_name]
+        for i, col in enumerate(df.columns):
+            worksheet.set_column(i, i, min(30, max(10, len(str(col)) + 5)))
+    return out.getvalue()
+
+def content_digest(raw: bytes) -> str:
+    """Cache key for an upload: one blake2b pass instead of Streamlit hashing the bytes."""
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+def columns_to_df(cols: dict, object_cols: tuple = ()) -> pd.DataFrame:
+    """SoA column lists -> DataFrame with pd.ArrowDtype (string[pyarrow]) flat columns.
+
+    object_cols (nested lists, e.g. 277 Dates) stay Python objects so CSV/Excel
+    exports render them as readable lists, not Arrow arrays.
+    """
+    import pyarrow as pa  # required (requirements.txt); imported on first parse only
+    df = pa.table({c: v for c, v in cols.items() if c not in object_cols}).to_pandas(types_mapper=pd.ArrowDtype)
+    for i, c in enumerate(cols):
+        if c in object_cols:
+            df.insert(i, c, pd.Series(cols[c], dtype=object))
+    return df
+
+def elements_table(segments: list, names: tuple):
+    """Arrow table of raw element lists (tag first), one string column per name.
+
+    Optional trailing elements (REF03, a DTP with no date) come back as "";
+    pa.Table.from_pylist would take the columns from the first row only.
+    """
+    import pyarrow as pa
+    cols = {name: [seg[i] if i < len(seg) else "" for seg in segments] for i, name in enumerate(names, 1)}
+    return pa.table(cols, schema=pa.schema([(name, pa.string()) for name in names]))
+
+def iter_x12_segments(edi):
+    """Yield stripped, non-empty segments from str/bytes or an iterable of such chunks.
+
+    "~" if the first _SNIFF_BYTES of the stream have one, else newline; the
+    chunk splitting itself is edi_x12.iter_segments, shared with the 271 parser.
+    """
+    chunks = iter([edi] if isinstance(edi, (str, bytes)) else edi)
+    head = next(chunks, b"")
+    while len(head) < _SNIFF_BYTES:  # small chunks: gather enough head to probe
+        more = next(chunks, None)
+        if more is None:
+            break
+        head += more
+    tilde, newline = ("~", "\n") if isinstance(head, str) else (b"~", b"\n")
+    seg_t = tilde if head.find(tilde, 0, _SNIFF_BYTES) != -1 else newline
+    yield from iter_segments(chain([head], chunks), seg_t)
+
+# ---------------- Upload decoding ----------------
+_ENCODINGS = ("utf-8", "cp1252", "latin-1")
+_DECODE_CHUNK = 64 * 1024
+_SNIFF_BYTES = 4096
+
+PUNCT_TABLE = str.maketrans({
+    0x2013: "-", 0x2014: "-", 0x2018: "'", 0x2019: "'",
+    0x201c: '"', 0x201d: '"', 0x00a0: " ",
+})
+# Same mapping for cp1252 payloads, applied to single bytes before decoding.
+CP1252_PUNCT = bytes.maketrans(b"\x96\x97\x91\x92\x93\x94\xa0", b"--''\"\" ")
+
+def sniff_type(head: bytes) -> str:
+    """Classify an upload by magic number: "zip", "pdf", "gzip" or "x12"."""
+    if head.startswith(b"PK\x03\x04"):
+        return "zip"
+    if head.startswith(b"%PDF"):
+        return "pdf"
+    if head.startswith(b"\x1f\x8b"):
+        return "gzip"
+    return "x12"
+
+def reject_non_x12(head: bytes) -> None:
+    kind = sniff_type(head)
+    if kind == "pdf":
+        raise ValueError("Not a plain-text X12 file (PDF detected).")
+    if kind == "gzip":
+        raise ValueError("GZIP detected. Upload uncompressed X12 or a ZIP containing it.")
+
+def sniff_encoding(head: bytes) -> str:
+    """BOM first, else the first codec that decodes the prefix (a cut multi-byte char is fine)."""
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    for enc in _ENCODINGS:
+        try:
+            codecs.getincrementaldecoder(enc)().decode(head[:_SNIFF_BYTES])
+            return enc
+        except UnicodeDecodeError:
+            continue
+    return "latin-1"
+
+def iter_raw_chunks(raw: bytes):
+    """Yield the X12 payload in fixed-size chunks; for a ZIP, stream its largest entry."""
+    if sniff_type(raw) != "zip":
+        yield from (raw[i:i + _DECODE_CHUNK] for i in range(0, len(raw), _DECODE_CHUNK))
+        return
+    import zipfile, zlib  # only needed for zipped uploads
+    try:
+        zf = zipfile.ZipFile(BytesIO(raw))
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Invalid ZIP archive: {e}")
+    with zf:
+        entries = [i for i in zf.infolist() if not i.is_dir()]
+        if not entries:
+            raise ValueError("ZIP archive contains no files.")
+        # Damaged entry data only surfaces while reading (bad deflate stream, CRC
+        # mismatch, truncation); encrypted/unsupported entries fail in zf.open.
+        try:
+            with zf.open(max(entries, key=lambda i: i.file_size)) as fh:
+                yield from iter(lambda: fh.read(_DECODE_CHUNK), b"")
+        except (zipfile.BadZipFile, zlib.error, EOFError, RuntimeError, NotImplementedError) as e:
+            raise ValueError(f"Unreadable ZIP entry: {e}")
+
+def skip_bom(chunks):
+    """Drop a UTF-8 BOM from the first chunk so ISA detection sees "ISA" at offset 0."""
+    chunks = iter(chunks)
+    first = next(chunks, b"")
+    yield first[len(codecs.BOM_UTF8):] if first.startswith(codecs.BOM_UTF8) else first
+    yield from chunks
+
+def normalize_punctuation(text: str) -> str:
+    # Smart quotes/dashes/nbsp pasted from Word or email break element matching.
+    # str.isascii() is O(1) (CPython flags ASCII-only strings), so clean text is free.
+    return text if text.isascii() else text.translate(PUNCT_TABLE)
+
+# ---------------- 276 / 277 ----------------
+def build_276(isa_ctrl, gs_ctrl, st_ctrl, payer_id, provider_name, provider_npi,
+              subscriber_last, subscriber_first, subscriber_id,
+              claim_control_number="", date_of_service=None):
+    """Builds a simple 276 Claim Status Inquiry"""
+    now = datetime.now()
+    # Each stamp formatted once; {now:%...} in the f-string would strftime per use.
+    yymmdd, ymd, hhmm = now.strftime("%y%m%d"), now.strftime("%Y%m%d"), now.strftime("%H%M")
+    dos = date_of_service or ymd
+    edi = (
+        f"ISA*00*          *00*          *ZZ*SENDERID       *ZZ*RECEIVERID     *{yymmdd}*{hhmm}*^*00501*{isa_ctrl:09d}*0*T*:~\n"
+        f"GS*HN*SENDER*RECEIVER*{ymd}*{hhmm}*{gs_ctrl}*X*005010X212~\n"
+        f"ST*276*{st_ctrl}*005010X212~\n"
+        f"BHT*0010*13*{claim_control_number or st_ctrl}*{ymd}*{hhmm}~\n"
+        f"HL*1**20*1~\n"
+        f"NM1*PR*2*PAYER NAME****PI*{payer_id}~\n"
+        f"HL*2*1*21*1~\n"
+        f"NM1*41*2*{provider_name}*****XX*{provider_npi}~\n"
+        f"HL*3*2*19*0~\n"
+        f"NM1*IL*1*{subscriber_last}*{subscriber_first}****MI*{subscriber_id}~\n"
+        f"DTP*472*D8*{dos}~\n"
+        f"SE*10*{st_ctrl}~\n"  # SE01 counts ST..SE inclusive
+        f"GE*1*{gs_ctrl}~\n"
+        f"IEA*1*{isa_ctrl:09d}~"
+    )
+    return edi
+
+_277_COLUMNS = ("TraceNumber", "ClaimID", "ClaimStatus", "TotalCharge", "TotalPaid",
+                "StatusComposite", "StatusDate", "PatientLast", "PatientFirst", "Dates")
+
+def _277_new_row(cols):
+    for c, col in cols.items():
+        col.append(None if c == "Dates" else "")
+
+def _277_ensure_row(cols):
+    if not cols["ClaimID"]:  # fields seen before the first CLP form their own row
+        _277_new_row(cols)
+
+def _h277_trn(parts, cols):
+    _277_ensure_row(cols)
+    if not cols["TraceNumber"][-1]:
+        cols["TraceNumber"][-1] = parts[2] if len(parts) > 2 else ""
+
+def _h277_clp(parts, cols):
+    _277_new_row(cols)
+    cols["ClaimID"][-1] = parts[1] if len(parts) > 1 else ""
+    cols["ClaimStatus"][-1] = parts[2] if len(parts) > 2 else ""
+    cols["TotalCharge"][-1] = parts[3] if len(parts) > 3 else ""
+    cols["TotalPaid"][-1] = parts[4] if len(parts) > 4 else ""
+
+def _h277_stc(parts, cols):
+    _277_ensure_row(cols)
+    cols["StatusComposite"][-1] = parts[1] if len(parts) > 1 else ""
+    cols["StatusDate"][-1] = parts[2] if len(parts) > 2 else ""
+
+def _h277_nm1_qc(parts, cols):
+    _277_ensure_row(cols)
+    cols["PatientLast"][-1] = parts[3] if len(parts) > 3 else ""
+    cols["PatientFirst"][-1] = parts[4] if len(parts) > 4 else ""
+
+# NM1 entity qualifier -> handler; other entities (payer, provider, ...) are skipped.
+_277_NM1_HANDLERS = {"QC": _h277_nm1_qc}
+
+def _h277_nm1(parts, cols):
+    handler = _277_NM1_HANDLERS.get(parts[1]) if len(parts) > 1 else None
+    if handler:
+        handler(parts, cols)
+
+def _h277_dtp(parts, cols):
+    _277_ensure_row(cols)
+    if cols["Dates"][-1] is None:
+        cols["Dates"][-1] = []
+    cols["Dates"][-1].append(parts[1:])
+
+# Segment tag (bytes) -> handler(parts, cols); tags not listed are skipped.
+_277_HANDLERS = {
+    b"TRN": _h277_trn,
+    b"CLP": _h277_clp,
+    b"STC": _h277_stc,
+    b"NM1": _h277_nm1,
+    b"DTP": _h277_dtp,
+}
+
+def parse_277(edi):
+    """Parse 277 file (bytes, str, or an iterable of byte chunks) and return structured DataFrame
+
+    Columns are string[pyarrow] (see columns_to_df);
+    Dates stays an object column holding None or a list of DTP element lists.
+    """
+    if isinstance(edi, str):
+        edi = edi.encode("utf-8")
+    # One list per column (SoA); every row gets exactly one slot in each list.
+    cols = {c: [] for c in _277_COLUMNS}
+    for line in iter_x12_segments(edi):
+        # Tags are ASCII: dispatch on bytes, decode only the segments we keep.
+        handler = _277_HANDLERS.get(line.partition(b"*")[0].upper())
+        if handler:
+            handler(line.decode("utf-8", errors="ignore").split("*"), cols)
+    return columns_to_df(cols, object_cols=("Dates",))
+
+# ---------------- 837 / 835 ----------------
+def build_837(payer_id, provider_npi, patient_name, patient_id, claim_id, amount):
+    now = datetime.now()
+    yymmdd, ymd, hhmm = now.strftime("%y%m%d"), now.strftime("%Y%m%d"), now.strftime("%H%M")
+    return f"""ISA*00**00**ZZ*SENDER*ZZ*RECEIVER*{yymmdd}*{hhmm}*^*00501*000000001*0*T*:~
+GS*HC*SENDER*RECEIVER*{ymd}*{hhmm}*1*X*005010X222A1~
+ST*837*0001*005010X222A1~
+BHT*0019*00*{claim_id}*{ymd}*{hhmm}*CH~
+NM1*85*2*BUDDHA CLINIC*****XX*{provider_npi}~
+HL*1**20*1~
+NM1*IL*1*{patient_name}****MI*{patient_id}~
+CLM*{claim_id}*{amount}***11:B:1*Y*A*Y*I~
+SE*7*0001~
+GE*1*1~
+IEA*1*000000001~"""
+
+BATCH_837_COLUMNS = ("payer_id", "provider_npi", "patient_name", "patient_id", "claim_id", "amount")
+
+def read_claims_csv(raw: bytes) -> pd.DataFrame:
+    df = pd.read_csv(BytesIO(raw), dtype=str, keep_default_na=False)
+    missing = [c for c in BATCH_837_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError("Claims CSV is missing column(s): " + ", ".join(missing))
+    return df
+
+def build_837_batch(df: pd.DataFrame) -> list:
+    """One build_837 document per row, built column-wise instead of a per-row Python loop."""
+    now = datetime.now()
+    yymmdd, ymd, hhmm = now.strftime("%y%m%d"), now.strftime("%Y%m%d"), now.strftime("%H%M")
+    c = {k: df[k].astype(str) for k in BATCH_837_COLUMNS}
+    docs = (
+        f"ISA*00**00**ZZ*SENDER*ZZ*RECEIVER*{yymmdd}*{hhmm}*^*00501*000000001*0*T*:~\n"
+        f"GS*HC*SENDER*RECEIVER*{ymd}*{hhmm}*1*X*005010X222A1~\n"
+        "ST*837*0001*005010X222A1~\n"
+        "BHT*0019*00*" + c["claim_id"] + f"*{ymd}*{hhmm}*CH~\n"
+        "NM1*85*2*BUDDHA CLINIC*****XX*" + c["provider_npi"] + "~\n"
+        "HL*1**20*1~\n"
+        "NM1*IL*1*" + c["patient_name"] + "****MI*" + c["patient_id"] + "~\n"
+        "CLM*" + c["claim_id"] + "*" + c["amount"] + "***11:B:1*Y*A*Y*I~\n"
+        "SE*7*0001~\n"
+        "GE*1*1~\n"
+        "IEA*1*000000001~"
+    )
+    return docs.tolist()
+
+def build_835(payer_name, payer_id, provider_npi, claim_id, patient_name, paid_amount):
+    now = datetime.now()
+    yymmdd, ymd, hhmm = now.strftime("%y%m%d"), now.strftime("%Y%m%d"), now.strftime("%H%M")
+    return f"""ISA*00**00**ZZ*{payer_id:<15}*ZZ*RECEIVER*{yymmdd}*{hhmm}*^*00501*000000001*0*T*:~
+GS*HP*{payer_id}*RECEIVER*{ymd}*{hhmm}*1*X*005010X221A1~
+ST*835*0001*005010X221A1~
+BPR*I*{paid_amount}*C*CHK*01*999999999*DA*123456789*{ymd}~
+N1*PR*{payer_name}*PI*{payer_id}~
+N1*PE*BUDDHA CLINIC*XX*{provider_npi}~
+CLP*{claim_id}*1*150*{paid_amount}**MC*{patient_name}*12*1~
+SE*6*0001~
+GE*1*1~
+IEA*1*000000001~"""
+
+def _h835_bpr(parts, out):
+    out["check"]["PaymentAmount"] = parts[2] if len(parts) > 2 else ""
+
+def _h835_trn(parts, out):
+    out["check"]["CheckNumber"] = parts[2] if len(parts) > 2 else ""
+
+# N1 entity qualifier -> (bucket in out, name key, id key).
+_835_N1_PARTIES = {
+    "PR": ("payer", "PayerName", "PayerID"),
+    "PE": ("payee", "PayeeName", "PayeeNPI"),
+}
+
+def _h835_n1(parts, out):
+    party = _835_N1_PARTIES.get(parts[1]) if len(parts) > 1 else None
+    if party:
+        bucket, name_key, id_key = party
+        out[bucket][name_key] = parts[2]
+        out[bucket][id_key] = parts[-1]
+
+def _h835_clp(parts, out):
+    cols = out["cols"]
+    cols["ClaimID"].append(parts[1])
+    cols["ClaimStatus"].append(parts[2])
+    cols["TotalCharge"].append(parts[3])
+    cols["TotalPaid"].append(parts[4])
+    cols["PatientName"].append("")
+
+def _h835_nm1(parts, out):
+    names = out["cols"]["PatientName"]
+    if len(parts) > 1 and parts[1] == "QC" and names:
+        names[-1] = parts[3]
+
+# Segment tag (bytes) -> handler(parts, out); tags not listed are skipped.
+_835_HANDLERS = {
+    b"BPR": _h835_bpr,
+    b"TRN": _h835_trn,
+    b"N1": _h835_n1,
+    b"CLP": _h835_clp,
+    b"NM1": _h835_nm1,
+}
+
+def parse_835_to_df(edi):
+    """Parse 835 file (bytes, str, or an iterable of byte chunks) into one row per CLP.
+
+    All columns are string[pyarrow] (see columns_to_df).
+    """
+    # One list per column (SoA); pandas adopts them as-is instead of aligning dict keys.
+    out = {
+        "payer": {}, "payee": {}, "check": {},
+        "cols": {"ClaimID": [], "ClaimStatus": [], "TotalCharge": [], "TotalPaid": [], "PatientName": []},
+    }
+    if isinstance(edi, str):
+        edi = edi.encode("utf-8")
+    for line in iter_x12_segments(edi):
+        handler = _835_HANDLERS.get(line.partition(b"*")[0].upper())
+        if handler:
+            handler(line.decode("utf-8", errors="ignore").split("*"), out)
+    cols = out["cols"]
+    n = len(cols["ClaimID"])
+    cols["PayerName"] = [out["payer"].get("PayerName", "")] * n
+    cols["PayeeName"] = [out["payee"].get("PayeeName", "")] * n
+    cols["CheckNumber"] = [out["check"].get("CheckNumber", "")] * n
+    cols["PaymentAmount"] = [out["check"].get("PaymentAmount", "")] * n
+    return columns_to_df(cols)
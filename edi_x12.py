@@ -1,7 +1,8 @@
 # edi_x12.py
 from dataclasses import dataclass
 from datetime import datetime
-from typing import List, Tuple, Dict, Optional
+from itertools import chain
+from typing import List, Tuple, Dict, Optional, Iterable, Iterator, Union, Callable
 
 # ---------------- Defaults & Maps ----------------
 DEFAULT_SEG = "~"
@@ -28,6 +29,10 @@ ServiceTypeMap = {
     "98": "Professional (Physician)",
 }
 
+# Precomputed once for the EQ picker (options + format_func lookup)
+SERVICE_TYPE_CODES = tuple(ServiceTypeMap)
+SERVICE_TYPE_LABELS = {k: f"{k} – {v}" for k, v in ServiceTypeMap.items()}
+
 # ---------------- Built-in Payer Profiles (extend via UI in app.py) ----------------
 PAYER_PROFILES: Dict[str, Dict] = {
     "default": {
@@ -94,6 +99,20 @@ def split_segments(edi_text: str, seg_t: str) -> List[str]:
 def parse_segments(edi_text: str, seg_t: str, elem_t: str) -> List[List[str]]:
     return [seg.split(elem_t) for seg in split_segments(edi_text, seg_t)]
 
+def iter_segments(chunks: Iterable, seg_t: Union[str, bytes]) -> Iterator:
+    """Lazily split a stream of text (or byte) chunks into stripped, non-empty segments."""
+    tail = seg_t[:0]
+    for chunk in chunks:
+        pieces = (tail + chunk).split(seg_t)
+        tail = pieces.pop()
+        for p in pieces:
+            p = p.strip()
+            if p:
+                yield p
+    tail = tail.strip()
+    if tail:
+        yield tail
+
 # ---------------- Envelopes ----------------
 def build_ISA(control_num: int, sender_id: str, receiver_id: str,
               elem_t: str = DEFAULT_ELEM, seg_t: str = DEFAULT_SEG) -> str:
@@ -165,6 +184,7 @@ def build_270(
     include_addresses: Optional[bool] = None,
     provider_addr: Optional[Dict[str, str]] = None,   # {"line1","line2","city","state","zip"}
     subscriber_addr: Optional[Dict[str, str]] = None, # same
+    ref_values: Optional[Dict[str, str]] = None,      # {"6P": "GROUP123"} for profile extra_ref
     elem_t: str = DEFAULT_ELEM,
     seg_t: str = DEFAULT_SEG,
 ) -> str:
@@ -184,7 +204,8 @@ def build_270(
     segs.append(build_ST(st_ctrl, elem_t=elem_t, seg_t=seg_t))
 
     # BHT
-    segs.append(elem_t.join(["BHT","0022","13", f"CN{st_ctrl}", datetime.utcnow().strftime("%Y%m%d"), datetime.utcnow().strftime("%H%M")]) + seg_t)
+    now = datetime.utcnow()  # one clock read, so date and time can't straddle midnight
+    segs.append(elem_t.join(["BHT","0022","13", f"CN{st_ctrl}", now.strftime("%Y%m%d"), now.strftime("%H%M")]) + seg_t)
 
     # 2100A Payer
     segs.append(elem_t.join(["HL","1","","20","1"]) + seg_t)
@@ -207,9 +228,10 @@ def build_270(
         if city or state or zipc:
             segs.append(elem_t.join(["N4", city, state, zipc]) + seg_t)
 
-    # Extra REF per profile
+    # Extra REF per profile; values are filled here so callers never patch the output
+    ref_values = ref_values or {}
     for ref in prof.get("extra_ref", []):
-        segs.append(elem_t.join(["REF", ref, "PLACEHOLDER"]) + seg_t)
+        segs.append(elem_t.join(["REF", ref, ref_values.get(ref) or "PLACEHOLDER"]) + seg_t)
 
     # 2100C Subscriber
     has_child = "1" if dependent else "0"
@@ -255,9 +277,8 @@ def build_270(
     for stc in eq_list:
         segs.append(elem_t.join(["EQ", stc]) + seg_t)
 
-    # Segment count ST..SE
-    current_text = "".join(segs[2:])
-    seg_count = current_text.count(seg_t) + 1
+    # Segment count ST..SE (segs holds one segment per entry; +1 for SE itself)
+    seg_count = len(segs) - 2 + 1
     segs.append(build_SE(st_ctrl, seg_count, elem_t, seg_t))
     segs.append(build_GE(gs_ctrl, 1, elem_t, seg_t))
     segs.append(build_IEA(isa_ctrl, 1, elem_t, seg_t))
@@ -265,120 +286,148 @@ def build_270(
     return "".join(segs)
 
 # ---------------- Validators ----------------
-def validate_envelopes(edi_text: str) -> List[str]:
-    """Light checks: ST/SE segment count."""
+def _check_st_se(st_idx: List[int], se_segs: List[Tuple[int, List[str]]]) -> List[str]:
     warnings: List[str] = []
-    seg_t, elem_t, _ = detect_delimiters(edi_text)
-    segs = parse_segments(edi_text, seg_t, elem_t)
-
-    st_idx = [i for i,s in enumerate(segs) if s and s[0].upper()=="ST"]
-    se_idx = [i for i,s in enumerate(segs) if s and s[0].upper()=="SE"]
     for i, si in enumerate(st_idx):
-        if i >= len(se_idx):
+        if i >= len(se_segs):
             warnings.append("SE segment missing for an ST.")
             break
-        ei = se_idx[i]
-        between = segs[si:ei+1]
+        ei, se = se_segs[i]
         try:
-            declared = int(segs[ei][1])
+            declared = int(se[1])
         except Exception:
             declared = 0
             warnings.append("SE01 missing or not integer.")
-        actual = len(between)
+        actual = max(ei - si + 1, 0)
         if declared and declared != actual:
             warnings.append(f"SE01={declared} but counted {actual} segments between ST..SE.")
     return warnings
 
-# ---------------- 271 Parser + post-processing ----------------
-def parse_271(edi_text: str) -> Dict:
+def validate_envelopes(edi_text: str) -> List[str]:
+    """Light checks: ST/SE segment count."""
     seg_t, elem_t, _ = detect_delimiters(edi_text)
-    if "ISA" not in edi_text[:200] and seg_t == DEFAULT_SEG and edi_text.count(DEFAULT_SEG) < 2:
-        seg_t = "\n"
     segs = parse_segments(edi_text, seg_t, elem_t)
 
+    st_idx = [i for i,s in enumerate(segs) if s and s[0].upper()=="ST"]
+    se_segs = [(i, s) for i,s in enumerate(segs) if s and s[0].upper()=="SE"]
+    return _check_st_se(st_idx, se_segs)
+
+# ---------------- 271 Parser + post-processing ----------------
+_NM1_ENTITIES = {"PR": "payer", "1P": "provider", "IL": "subscriber", "QD": "dependent"}
+
+def _h271_nm1(parts: List[str], out: Dict) -> None:
+    key = _NM1_ENTITIES.get(parts[1].strip().upper() if len(parts) > 1 else "")
+    if key in ("payer", "provider"):
+        out[key] = {
+            "name": parts[3] if len(parts) > 3 else "",
+            "id_qual": parts[8] if len(parts) > 8 else "",
+            "id": parts[9] if len(parts) > 9 else "",
+        }
+    elif key:
+        out[key] = {
+            "last": parts[3] if len(parts) > 3 else "",
+            "first": parts[4] if len(parts) > 4 else "",
+            "id_qual": parts[8] if len(parts) > 8 else "",
+            "id": parts[9] if len(parts) > 9 else "",
+        }
+
+def _h271_trn(parts: List[str], out: Dict) -> None:
+    out["trace"] = {
+        "trace_type": parts[1] if len(parts) > 1 else "",
+        "trace_num": parts[2] if len(parts) > 2 else "",
+    }
+
+def _h271_eb(parts: List[str], out: Dict) -> None:
+    eb = {f"E{i:02d}": (parts[i] if len(parts) > i else "") for i in range(1, 14)}
+    out["eb"].append({
+        "EB01": eb["E01"],
+        "Coverage": EB01_MAP.get(eb["E01"], ""),
+        "EB02": eb["E02"],
+        "ServiceType": eb["E03"],
+        "PlanDesc": eb["E04"],
+        "TimePeriod": eb["E05"],
+        "BenefitAmt": eb["E06"],
+        "Percent": eb["E07"],
+        "QtyQual": eb["E08"],
+        "Qty": eb["E09"],
+        "AuthInd": eb["E10"],
+        "InPlan": eb["E11"],
+        "Proc": eb["E12"],
+        "Raw": eb,
+    })
+
+def _h271_aaa(parts: List[str], out: Dict) -> None:
+    out["aaa"].append({
+        "reject_code": parts[3] if len(parts) > 3 else "",
+        "followup_action": parts[4] if len(parts) > 4 else "",
+    })
+
+def _latin1(b: bytes) -> str:
+    return b.decode("latin-1")
+
+# Segment tag -> handler(parts, out); tags not listed are skipped unsplit.
+_271_HANDLERS = {
+    "NM1": _h271_nm1,
+    "TRN": _h271_trn,
+    "EB": _h271_eb,
+    "AAA": _h271_aaa,
+    "DTP": lambda parts, out: out["dtp"].append(parts),
+    "REF": lambda parts, out: out["ref"].append(parts),
+}
+
+def parse_271(edi_text: Union[str, bytes, Iterable[str], Iterable[bytes]],
+              decode: Optional[Callable[[bytes], str]] = None) -> Dict:
+    """
+    Accepts the whole 271 as one str/bytes or an iterable of str or bytes chunks.
+    Segments are tokenized lazily; delimiters are detected from the first chunk.
+    Bytes are split on the raw delimiters and only segments that have a handler
+    are decoded, with ``decode`` (default latin-1).
+    """
+    chunks = iter([edi_text] if isinstance(edi_text, (str, bytes)) else edi_text)
+    head = next(chunks, "")
+    if isinstance(head, str):
+        head_text, as_text = head, None
+    else:
+        head_text, as_text = head.decode("latin-1"), (decode or _latin1)
+    seg_t, elem_t, _ = detect_delimiters(head_text)
+    if "ISA" not in head_text[:200] and seg_t == DEFAULT_SEG and head_text.count(DEFAULT_SEG) < 2:
+        seg_t = "\n"
+    # latin-1 maps bytes 1:1, so the detected delimiters split raw bytes too
+    seg_k, elem_k = (seg_t, elem_t) if as_text is None else (seg_t.encode("latin-1"), elem_t.encode("latin-1"))
+
+    first_tags: List[str] = []
+    st_idx: List[int] = []
+    se_segs: List[Tuple[int, List[str]]] = []
     out: Dict = {
         "payer": {}, "provider": {}, "subscriber": {}, "dependent": {},
         "eb": [], "aaa": [], "trace": {}, "dtp": [], "ref": [],
         "_debug": {
             "segment_terminator": repr(seg_t),
             "element_separator": repr(elem_t),
-            "segment_count": len(segs),
-            "first_tags": [s[0] if s else "" for s in segs[:12]],
+            "segment_count": 0,
+            "first_tags": first_tags,
         }
     }
 
-    for parts in segs:
-        if not parts: continue
-        tag = parts[0].strip().upper()
-
-        if tag == "NM1":
-            ent = parts[1].strip().upper() if len(parts) > 1 else ""
-            if ent == "PR":
-                out["payer"] = {
-                    "name": parts[3] if len(parts) > 3 else "",
-                    "id_qual": parts[8] if len(parts) > 8 else "",
-                    "id": parts[9] if len(parts) > 9 else "",
-                }
-            elif ent == "1P":
-                out["provider"] = {
-                    "name": parts[3] if len(parts) > 3 else "",
-                    "id_qual": parts[8] if len(parts) > 8 else "",
-                    "id": parts[9] if len(parts) > 9 else "",
-                }
-            elif ent == "IL":
-                out["subscriber"] = {
-                    "last": parts[3] if len(parts) > 3 else "",
-                    "first": parts[4] if len(parts) > 4 else "",
-                    "id_qual": parts[8] if len(parts) > 8 else "",
-                    "id": parts[9] if len(parts) > 9 else "",
-                }
-            elif ent == "QD":
-                out["dependent"] = {
-                    "last": parts[3] if len(parts) > 3 else "",
-                    "first": parts[4] if len(parts) > 4 else "",
-                    "id_qual": parts[8] if len(parts) > 8 else "",
-                    "id": parts[9] if len(parts) > 9 else "",
-                }
-
-        elif tag == "TRN":
-            out["trace"] = {
-                "trace_type": parts[1] if len(parts) > 1 else "",
-                "trace_num": parts[2] if len(parts) > 2 else "",
-            }
-
-        elif tag == "EB":
-            eb = {f"E{i:02d}": (parts[i] if len(parts) > i else "") for i in range(1, 14)}
-            rec = {
-                "EB01": eb["E01"],
-                "Coverage": EB01_MAP.get(eb["E01"], ""),
-                "EB02": eb["E02"],
-                "ServiceType": eb["E03"],
-                "PlanDesc": eb["E04"],
-                "TimePeriod": eb["E05"],
-                "BenefitAmt": eb["E06"],
-                "Percent": eb["E07"],
-                "QtyQual": eb["E08"],
-                "Qty": eb["E09"],
-                "AuthInd": eb["E10"],
-                "InPlan": eb["E11"],
-                "Proc": eb["E12"],
-                "Raw": eb,
-            }
-            out["eb"].append(rec)
-
-        elif tag == "AAA":
-            out["aaa"].append({
-                "reject_code": parts[3] if len(parts) > 3 else "",
-                "followup_action": parts[4] if len(parts) > 4 else "",
-            })
-
-        elif tag == "DTP":
-            out["dtp"].append(parts)
-
-        elif tag == "REF":
-            out["ref"].append(parts)
-
-    out["_validation"] = validate_envelopes(edi_text)
+    n = 0
+    for n, seg in enumerate(iter_segments(chain([head], chunks), seg_k), 1):
+        seg_tag = seg.partition(elem_k)[0]
+        if as_text:
+            seg_tag = seg_tag.decode("latin-1")
+        if n <= 12:
+            first_tags.append(seg_tag)
+        handler = _271_HANDLERS.get(seg_tag.strip().upper())
+        # Only segments the report uses are split into elements
+        if handler is None:
+            if seg_tag.upper() == "ST":
+                st_idx.append(n)
+            elif seg_tag.upper() == "SE":
+                se_segs.append((n, (as_text(seg) if as_text else seg).split(elem_t)))
+            continue
+        handler((as_text(seg) if as_text else seg).split(elem_t), out)
+
+    out["_debug"]["segment_count"] = n
+    out["_validation"] = _check_st_se(st_idx, se_segs)
     return out
 
 def normalize_eb_for_reporting(eb_rows: List[Dict]) -> Dict[str, Optional[str]]:
@@ -0,0 +1,50 @@
+import zipfile
+from io import BytesIO
+from types import SimpleNamespace
+
+import pytest
+
+st = pytest.importorskip("streamlit")
+openpyxl = pytest.importorskip("openpyxl")
+
+from edi_cache import parse_277_cached, session_upload, xlsx_cached
+from edi_helpers import content_digest
+
+SAMPLE_277 = b"ISA*00~TRN*1*T1~CLP*C1*1*100*50~STC*A1*20240101~NM1*QC*1*DOE*JOHN~CLP*C2*2*10*0~"
+
+
+def test_cached_workbook_keeps_every_cell():
+    digest = content_digest(SAMPLE_277)
+    df = parse_277_cached(digest, SAMPLE_277)
+    ws = openpyxl.load_workbook(BytesIO(xlsx_cached(digest, "277_Parsed", df)))["277_Parsed"]
+    rows = [list(r) for r in ws.iter_rows(values_only=True)]
+    assert rows[0][:2] == ["TraceNumber", "ClaimID"]
+    assert rows[2] == [None, "C1", "1", "100", "50", "A1", "20240101", "DOE", "JOHN", None]
+
+
+def test_session_upload_parses_once_per_file_id():
+    calls = []
+
+    def parse(digest, raw):
+        calls.append(digest)
+        return len(raw)
+
+    upload = SimpleNamespace(file_id="f1", getvalue=lambda: SAMPLE_277)
+    assert session_upload("test_upload", upload, parse) == (content_digest(SAMPLE_277), len(SAMPLE_277))
+    session_upload("test_upload", upload, parse)
+    assert len(calls) == 1
+    session_upload("test_upload", SimpleNamespace(file_id="f2", getvalue=lambda: b"ISA~"), parse)
+    assert len(calls) == 2
+
+
+def test_damaged_zip_upload_raises_value_error_and_is_not_memoized():
+    out = BytesIO()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("a.x12", SAMPLE_277 * 200)
+    archive = bytearray(out.getvalue())
+    for i in range(55, 95):
+        archive[i] ^= 0xFF  # damage the deflate stream, not the headers
+    upload = SimpleNamespace(file_id="bad", getvalue=lambda: bytes(archive))
+    with pytest.raises(ValueError):
+        session_upload("test_bad_zip", upload, parse_277_cached)
+    assert "test_bad_zip" not in st.session_state
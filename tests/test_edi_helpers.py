@@ -0,0 +1,134 @@
+import zipfile
+from io import BytesIO
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+openpyxl = pytest.importorskip("openpyxl")
+pytest.importorskip("xlsxwriter")
+
+import edi_835
+import edi_837
+import edi_helpers
+from edi_helpers import df_to_xlsx, elements_table, iter_raw_chunks, parse_277, parse_835_to_df
+from edi_x12 import parse_271, validate_envelopes
+
+
+def _sheet_rows(xlsx: bytes, sheet_name: str) -> list:
+    ws = openpyxl.load_workbook(BytesIO(xlsx))[sheet_name]
+    return [list(r) for r in ws.iter_rows(values_only=True)]
+
+
+def test_df_to_xlsx_round_trips_every_cell():
+    df = pd.DataFrame({
+        "ClaimID": ["C1", "C2", "C3"],
+        "ClaimStatus": ["1", "2", "4"],
+        "TotalCharge": ["100", "10", "55.5"],
+        "PatientName": ["DOE", "ROE", "POE"],
+    })
+    rows = _sheet_rows(df_to_xlsx(df, "835_Parsed"), "835_Parsed")
+    assert rows[0] == list(df.columns)
+    assert rows[1:] == df.values.tolist()
+
+
+SAMPLE_277 = (b"ISA*00~TRN*1*T1~CLP*C1*1*100*50~STC*A1*20240101~NM1*QC*1*DOE*JOHN~"
+              b"DTP*472*D8*20240101~DTP*050*D8*20240102~CLP*C2*2*10*0~")
+
+
+def test_parse_277_dates_stay_readable_in_exports():
+    df = parse_277(SAMPLE_277)
+    assert df["Dates"].dtype == object
+    assert df["Dates"].tolist() == [None, [["472", "D8", "20240101"], ["050", "D8", "20240102"]], None]
+    expected = "[['472', 'D8', '20240101'], ['050', 'D8', '20240102']]"
+    assert expected in df.to_csv(index=False)
+    rows = _sheet_rows(df_to_xlsx(df, "277_Parsed"), "277_Parsed")
+    assert rows[0] == list(df.columns)
+    # xlsxwriter leaves empty strings as blank cells
+    assert rows[2] == [None, "C1", "1", "100", "50", "A1", "20240101", "DOE", "JOHN", expected]
+
+
+@pytest.mark.parametrize("size", [1, 7, 64 * 1024])
+def test_parse_277_same_result_for_any_chunking(size):
+    chunks = [SAMPLE_277[i:i + size] for i in range(0, len(SAMPLE_277), size)]
+    pd.testing.assert_frame_equal(parse_277(iter(chunks)), parse_277(SAMPLE_277))
+
+
+def test_parse_835_accepts_lowercase_tags():
+    upper = b"BPR*I*100~TRN*1*CHK1~N1*PR*PAYER*PI*99~N1*PE*CLINIC*XX*123~CLP*C1*1*100*50~NM1*QC*1*DOE~"
+    lower = b"bpr*I*100~trn*1*CHK1~n1*PR*PAYER*PI*99~n1*PE*CLINIC*XX*123~clp*C1*1*100*50~nm1*QC*1*DOE~"
+    df = parse_835_to_df(lower)
+    pd.testing.assert_frame_equal(df, parse_835_to_df(upper))
+    assert df.loc[0, ["ClaimID", "PatientName", "PayerName", "CheckNumber"]].tolist() == ["C1", "DOE", "PAYER", "CHK1"]
+
+
+def test_elements_table_keeps_columns_missing_from_the_first_segment():
+    pytest.importorskip("pyarrow")
+    parsed = parse_271(b"ISA*00~ST*271*0001~REF*SY*123~REF*6P*GRP1*Group Desc~"
+                       b"DTP*346*D8~DTP*356*D8*20240101~SE*6*0001~")
+    ref = elements_table(parsed["ref"], ("qualifier", "value", "description"))
+    dtp = elements_table(parsed["dtp"], ("qualifier", "format", "date"))
+    assert ref.to_pydict() == {"qualifier": ["SY", "6P"], "value": ["123", "GRP1"],
+                               "description": ["", "Group Desc"]}
+    assert dtp.to_pydict() == {"qualifier": ["346", "356"], "format": ["D8", "D8"],
+                               "date": ["", "20240101"]}
+    assert elements_table([], ("qualifier", "value", "description")).column_names == [
+        "qualifier", "value", "description"]
+
+
+def _zipped(payload: bytes, method: int) -> bytearray:
+    out = BytesIO()
+    with zipfile.ZipFile(out, "w", method) as zf:
+        zf.writestr("claims.x12", payload)
+    return bytearray(out.getvalue())
+
+
+@pytest.mark.parametrize("method", [zipfile.ZIP_DEFLATED, zipfile.ZIP_STORED])
+def test_corrupt_zip_entry_raises_value_error(method):
+    archive = _zipped(b"ISA*00~" + b"CLP*C1*1*100*50~" * 2000, method)
+    data_start = 30 + len("claims.x12")  # local file header + name
+    for i in range(data_start + 20, data_start + 60):
+        archive[i] ^= 0xFF  # deflate: invalid stream; stored: CRC mismatch
+    with pytest.raises(ValueError, match="Unreadable ZIP entry"):
+        list(iter_raw_chunks(bytes(archive)))
+
+
+_BUILT_DOCS = {
+    "276": lambda: edi_helpers.build_276(1, 1, "0001", "PAYER1", "CLINIC", "1234567893", "DOE", "JOHN", "M1"),
+    "837": lambda: edi_helpers.build_837("PAYER1", "1234567893", "DOE", "M1", "C1", "100"),
+    "837_batch": lambda: edi_helpers.build_837_batch(pd.DataFrame(
+        [["PAYER1", "1234567893", "DOE", "M1", "C1", "100"]], columns=edi_helpers.BATCH_837_COLUMNS))[0],
+    "835": lambda: edi_helpers.build_835("PAYER", "PAYER1", "1234567893", "C1", "DOE", "50"),
+    "edi_837": lambda: edi_837.build_837(1, 1, 1, "SENDER", "RECEIVER", "1234567893", "DOE", "M1",
+                                         "C1", "100", "20240101"),
+    "edi_837_range": lambda: edi_837.build_837(1, 1, 1, "SENDER", "RECEIVER", "1234567893", "DOE", "M1",
+                                               "C1", "100", "20240101", "20240102"),
+    "edi_835": lambda: edi_835.build_835(1, 1, 1, "PAYER", "PAYER1", "1234567893", "C1", "DOE", "50",
+                                         "CHK1", "20240101"),
+}
+
+
+@pytest.mark.parametrize("kind", list(_BUILT_DOCS))
+def test_built_documents_have_valid_se_counts(kind):
+    assert validate_envelopes(_BUILT_DOCS[kind]()) == []
+
+
+def test_build_837_batch_matches_build_837_per_row(monkeypatch):
+    fixed = edi_helpers.datetime(2024, 1, 2, 3, 4)
+
+    class FixedDatetime:
+        @staticmethod
+        def now():
+            return fixed
+
+    monkeypatch.setattr(edi_helpers, "datetime", FixedDatetime)
+    raw = (",".join(edi_helpers.BATCH_837_COLUMNS) + "\n"
+           "PAYER1,1234567893,DOE,M1,C1,100.00\n"
+           "PAYER2,1234567893,ROE,M2,C2,0050\n").encode()
+    df = edi_helpers.read_claims_csv(raw)
+    singles = [edi_helpers.build_837(*row) for row in df[list(edi_helpers.BATCH_837_COLUMNS)].itertuples(index=False)]
+    assert edi_helpers.build_837_batch(df) == singles
+
+
+def test_read_claims_csv_reports_missing_columns():
+    with pytest.raises(ValueError, match="patient_id, amount"):
+        edi_helpers.read_claims_csv(b"payer_id,provider_npi,patient_name,claim_id\nP,1,DOE,C1\n")